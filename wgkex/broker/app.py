@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 """wgkex broker"""
 import dataclasses
-import json
 import re
-from typing import Dict, Tuple, Any
+import socket
+from typing import Any, Dict, Tuple
 
+import orjson
 import paho.mqtt.client as mqtt_client
 from flask import Flask, render_template, request, Response
 from flask.app import Flask as Flask_app
+from flask.json.provider import DefaultJSONProvider
 from flask_mqtt import Mqtt
 
 from waitress import serve
@@ -15,6 +17,7 @@ from wgkex.config import config
 from wgkex.common import logger
 from wgkex.common.utils import is_valid_domain
 from wgkex.broker.metrics import WorkerMetricsCollection
+from wgkex.broker.publisher import KeyPublisher
 from wgkex.common.mqtt import (
     CONNECTED_PEERS_METRIC,
     TOPIC_WORKER_STATUS,
@@ -23,8 +26,20 @@ from wgkex.common.mqtt import (
 
 WG_PUBKEY_PATTERN = re.compile(r"^[A-Za-z0-9+/]{42}[AEIMQUYcgkosw480]=$")
 
+# The configuration is only read at startup, changes require a restart of the broker
+_CONFIG = config.get_config()
+_VALID_DOMAINS = frozenset(
+    domain for domain in _CONFIG.domains if is_valid_domain(domain)
+)
+# in case we want to decide here later we want to publish it only to dedicated gateways
+_PUBLISH_GATEWAY = "all"
+#               domain -> topic to publish exchanged keys on
+_PUBLISH_TOPICS: Dict[str, str] = {
+    domain: f"wireguard/{domain}/{_PUBLISH_GATEWAY}" for domain in _VALID_DOMAINS
+}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class KeyExchange:
     """A key exchange message.
 
@@ -45,13 +60,69 @@ class KeyExchange:
         Returns:
             A KeyExchange object.
         """
+        if not isinstance(msg, dict):
+            raise ValueError("Key exchange message must be a JSON object.")
         public_key = is_valid_wg_pubkey(msg.get("public_key"))
         domain = str(msg.get("domain"))
-        if not is_valid_domain(domain):
+        if domain not in _VALID_DOMAINS:
             raise ValueError(f"Domain {domain} not in configured domains.")
         return cls(public_key=public_key, domain=domain)
 
 
+@dataclasses.dataclass(slots=True)
+class WorkerData:
+    """The endpoint data a worker published for one of its domains.
+
+    Attributes:
+        external_address: The publicly reachable address of the worker.
+        port: The WireGuard listen port of the worker for this domain.
+        public_key: The WireGuard public key of the worker for this domain.
+        link_address: The link-local address of the worker's WireGuard interface.
+    """
+
+    external_address: str
+    port: int
+    public_key: str
+    link_address: str
+
+    @classmethod
+    def from_dict(cls, msg: dict) -> "WorkerData":
+        """Creates a new WorkerData object from dict.
+
+        Arguments:
+            msg: The message to convert.
+        Raises:
+            KeyError: If a field is missing in the message.
+            ValueError: If the port is not an integer or another field is not a string.
+        Returns:
+            A WorkerData object.
+        """
+        return cls(
+            external_address=_get_str(msg, "ExternalAddress"),
+            port=int(msg["Port"]),
+            public_key=_get_str(msg, "PublicKey"),
+            link_address=_get_str(msg, "LinkAddress"),
+        )
+
+
+def _get_str(msg: dict, key: str) -> str:
+    """Returns the value of key in msg, raising ValueError if it is not a string."""
+    value = msg[key]
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string, got {value!r}.")
+    return value
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """A Flask JSON provider (de)serializing with orjson instead of the json module."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
 def _fetch_app_config() -> Flask_app:
     """Creates the Flask app from configuration.
 
@@ -59,7 +130,8 @@ def _fetch_app_config() -> Flask_app:
         A created Flask app.
     """
     app = Flask(__name__)
-    mqtt_cfg = config.get_config().mqtt
+    app.json = ORJSONProvider(app)
+    mqtt_cfg = _CONFIG.mqtt
     app.config["MQTT_BROKER_URL"] = mqtt_cfg.broker_url
     app.config["MQTT_BROKER_PORT"] = mqtt_cfg.broker_port
     app.config["MQTT_USERNAME"] = mqtt_cfg.username
@@ -71,90 +143,103 @@ def _fetch_app_config() -> Flask_app:
 
 app = _fetch_app_config()
 mqtt = Mqtt(app)
+key_publisher = KeyPublisher(mqtt.publish, publish_lists=_CONFIG.publish_key_lists)
+key_publisher.start()
 worker_metrics = WorkerMetricsCollection()
-worker_data: Dict[Tuple[str, str], Dict] = {}
+worker_data: Dict[Tuple[str, str], WorkerData] = {}
+
+
+# Bodies of constant API responses, serialized only once
+_OK_BODY = orjson.dumps({"Message": "OK"})
+_NO_GATEWAY_ERROR_BODY = orjson.dumps(
+    {
+        "error": {
+            "message": "no gateway online for this domain, please check the domain value and try again later"
+        }
+    }
+)
+_GATEWAY_DATA_ERROR_BODY = orjson.dumps(
+    {"error": {"message": "could not get gateway data"}}
+)
+
+
+def _json_response(body: bytes, status: int) -> Response:
+    """Creates a JSON response from an already serialized body."""
+    return Response(body, status=status, mimetype="application/json")
+
+
+# The main page is static, so render it only once
+with app.app_context():
+    _INDEX_HTML = render_template("index.html")
 
 
 @app.route("/", methods=["GET"])
-def index() -> str:
+def index() -> Tuple[str, int, Dict[str, str]]:
     """Returns main page"""
-    return render_template("index.html")
+    return _INDEX_HTML, 200, {"Cache-Control": "public, max-age=3600"}
 
 
 @app.route("/api/v1/wg/key/exchange", methods=["POST"])
-def wg_api_v1_key_exchange() -> Tuple[Response | Dict, int]:
+def wg_api_v1_key_exchange() -> Response | Tuple[Dict, int]:
     """Retrieves a new key and validates.
     Returns:
         Status message.
     """
     try:
-        data = KeyExchange.from_dict(request.get_json(force=True))
+        data = KeyExchange.from_dict(orjson.loads(request.get_data(cache=False)))
     except Exception as ex:
         return {"error": {"message": str(ex)}}, 400
 
     key = data.public_key
     domain = data.domain
-    # in case we want to decide here later we want to publish it only to dedicated gateways
-    gateway = "all"
-    logger.info(f"wg_api_v1_key_exchange: Domain: {domain}, Key:{key}")
+    logger.info("wg_api_v1_key_exchange: Domain: %s, Key:%s", domain, key)
 
-    mqtt.publish(f"wireguard/{domain}/{gateway}", key)
-    return {"Message": "OK"}, 200
+    key_publisher.put(_PUBLISH_TOPICS[domain], key)
+    return _json_response(_OK_BODY, 200)
 
 
 @app.route("/api/v2/wg/key/exchange", methods=["POST"])
-def wg_api_v2_key_exchange() -> Tuple[Response | Dict, int]:
+def wg_api_v2_key_exchange() -> Response | Tuple[Dict, int]:
     """Retrieves a new key, validates it and responds with a worker/gateway the client should connect to.
 
     Returns:
         Status message, Endpoint with address/domain, port pubic key and link address.
     """
     try:
-        data = KeyExchange.from_dict(request.get_json(force=True))
+        data = KeyExchange.from_dict(orjson.loads(request.get_data(cache=False)))
     except Exception as ex:
         return {"error": {"message": str(ex)}}, 400
 
     key = data.public_key
     domain = data.domain
-    # in case we want to decide here later we want to publish it only to dedicated gateways
-    gateway = "all"
-    logger.info(f"wg_api_v2_key_exchange: Domain: {domain}, Key:{key}")
+    logger.info("wg_api_v2_key_exchange: Domain: %s, Key:%s", domain, key)
 
-    mqtt.publish(f"wireguard/{domain}/{gateway}", key)
+    key_publisher.put(_PUBLISH_TOPICS[domain], key)
 
     best_worker, diff, current_peers = worker_metrics.get_best_worker(domain)
     if best_worker is None:
-        logger.warning(f"No worker online for domain {domain}")
-        return {
-            "error": {
-                "message": "no gateway online for this domain, please check the domain value and try again later"
-            }
-        }, 400
+        logger.warning("No worker online for domain %s", domain)
+        return _json_response(_NO_GATEWAY_ERROR_BODY, 400)
 
     # Update number of peers locally to interpolate data between MQTT updates from the worker
-    # TODO fix data race
-    current_peers_domain = (
-        worker_metrics.get(best_worker)
-        .get_domain_metrics(domain)
-        .get(CONNECTED_PEERS_METRIC, 0)
-    )
-    worker_metrics.update(
-        best_worker, domain, CONNECTED_PEERS_METRIC, current_peers_domain + 1
-    )
+    worker_metrics.atomic_increment(best_worker, domain, CONNECTED_PEERS_METRIC)
     logger.debug(
-        f"Chose worker {best_worker} with {current_peers} connected clients ({diff})"
+        "Chose worker %s with %s connected clients (%s)",
+        best_worker,
+        current_peers,
+        diff,
     )
 
     w_data = worker_data.get((best_worker, domain), None)
     if w_data is None:
-        logger.error(f"Couldn't get worker endpoint data for {best_worker}/{domain}")
-        return {"error": {"message": "could not get gateway data"}}, 500
+        logger.error("Couldn't get worker endpoint data for %s/%s", best_worker, domain)
+        return _json_response(_GATEWAY_DATA_ERROR_BODY, 500)
 
     endpoint = {
-        "Address": w_data.get("ExternalAddress"),
-        "Port": str(w_data.get("Port")),
-        "AllowedIPs": [w_data.get("LinkAddress")],
-        "PublicKey": w_data.get("PublicKey"),
+        "Address": w_data.external_address,
+        "Port": str(w_data.port),
+        "AllowedIPs": [w_data.link_address],
+        "PublicKey": w_data.public_key,
     }
 
     return {"Endpoint": endpoint}, 200
@@ -167,10 +252,17 @@ def handle_mqtt_connect(
     """Prints status of connect message."""
     # TODO(ruairi): Clarify current usage of this function.
     logger.debug(
-        "MQTT connected to {}:{}".format(
-            app.config["MQTT_BROKER_URL"], app.config["MQTT_BROKER_PORT"]
-        )
+        "MQTT connected to %s:%s",
+        app.config["MQTT_BROKER_URL"],
+        app.config["MQTT_BROKER_PORT"],
     )
+    # Send our small publish packets right away instead of letting Nagle's algorithm hold them back
+    sock = client.socket()
+    if sock is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logger.warning("Could not set TCP_NODELAY on MQTT socket: %s", e)
     mqtt.subscribe("wireguard-metrics/#")
     mqtt.subscribe(TOPIC_WORKER_STATUS.format(worker="+"))
     mqtt.subscribe(TOPIC_WORKER_WG_DATA.format(worker="+", domain="+"))
@@ -182,11 +274,16 @@ def handle_mqtt_message_metrics(
 ) -> None:
     """Processes published metrics from workers."""
     logger.debug(
-        f"MQTT message received on {message.topic}: {message.payload.decode()}"
+        "MQTT message received on %s: %r", message.topic, message.payload[:128]
     )
-    _, domain, worker, metric = message.topic.split("/", 3)
-    if not is_valid_domain(domain):
-        logger.error(f"Domain {domain} not in configured domains")
+    try:
+        _, domain, worker, metric = message.topic.split("/", 3)
+    except ValueError:
+        logger.error("Ignored MQTT metrics message on topic %s", message.topic)
+        return
+
+    if domain not in _VALID_DOMAINS:
+        logger.error("Domain %s not in configured domains", domain)
         return
 
     if not worker or not metric:
@@ -195,7 +292,7 @@ def handle_mqtt_message_metrics(
 
     data = int(message.payload)
 
-    logger.info(f"Update worker metrics: {metric} on {worker}/{domain} = {data}")
+    logger.info("Update worker metrics: %s on %s/%s = %s", metric, worker, domain, data)
     worker_metrics.update(worker, domain, metric, data)
 
 
@@ -204,14 +301,18 @@ def handle_mqtt_message_status(
     client: mqtt_client.Client, userdata: bytes, message: mqtt_client.MQTTMessage
 ) -> None:
     """Processes status messages from workers."""
-    _, worker, _ = message.topic.split("/", 2)
+    try:
+        _, worker, _ = message.topic.split("/", 2)
+    except ValueError:
+        logger.error("Ignored MQTT status message on topic %s", message.topic)
+        return
 
     status = int(message.payload)
     if status < 1 and worker_metrics.get(worker).is_online():
-        logger.warning(f"Marking worker as offline: {worker}")
+        logger.warning("Marking worker as offline: %s", worker)
         worker_metrics.set_offline(worker)
     elif status >= 1 and not worker_metrics.get(worker).is_online():
-        logger.warning(f"Marking worker as online: {worker}")
+        logger.warning("Marking worker as online: %s", worker)
         worker_metrics.set_online(worker)
 
 
@@ -222,14 +323,25 @@ def handle_mqtt_message_data(
     """Processes data messages from workers.
 
     Stores them in a local dict"""
-    _, worker, domain, _ = message.topic.split("/", 3)
-    if not is_valid_domain(domain):
-        logger.error(f"Domain {domain} not in configured domains.")
+    try:
+        _, worker, domain, _ = message.topic.split("/", 3)
+    except ValueError:
+        logger.error("Ignored MQTT data message on topic %s", message.topic)
+        return
+    if domain not in _VALID_DOMAINS:
+        logger.error("Domain %s not in configured domains.", domain)
         return
 
-    data = json.loads(message.payload)
-    if not isinstance(data, dict):
-        logger.error("Invalid worker data received for %s/%s: %s", worker, domain, data)
+    try:
+        data = WorkerData.from_dict(orjson.loads(message.payload))
+    except (orjson.JSONDecodeError, TypeError, KeyError, ValueError) as e:
+        logger.error(
+            "Invalid worker data received for %s/%s: %r (%s)",
+            worker,
+            domain,
+            message.payload[:128],
+            e,
+        )
         return
 
     logger.info("Worker data received for %s/%s: %s", worker, domain, data)
@@ -242,7 +354,7 @@ def handle_mqtt_message(
 ) -> None:
     """Prints message contents."""
     logger.debug(
-        f"MQTT message received on {message.topic}: {message.payload.decode()}"
+        "MQTT message received on %s: %r", message.topic, message.payload[:128]
     )
 
 
@@ -280,10 +392,12 @@ def join_host_port(host: str, port: str) -> str:
 if __name__ == "__main__":
     listen_host = None
     listen_port = None
+    listen_threads = config.BrokerListen.threads
 
-    listen_config = config.get_config().broker_listen
+    listen_config = _CONFIG.broker_listen
     if listen_config is not None:
         listen_host = listen_config.host
         listen_port = listen_config.port
+        listen_threads = listen_config.threads
 
-    serve(app, host=listen_host, port=listen_port)
+    serve(app, host=listen_host, port=listen_port, threads=listen_threads)
@@ -0,0 +1,161 @@
+"""Unit tests for app.py"""
+
+import json
+import unittest
+
+import mock
+from wgkex.config import config
+
+_TEST_DOMAIN = "_ffmuc_domain.one"
+
+# Importing the app reads the configuration, so give it a placeholder config
+config._parsed_config = config.Config.from_dict(
+    {
+        "domains": [_TEST_DOMAIN],
+        "domain_prefixes": ["_ffmuc_"],
+        "workers": {},
+        "mqtt": {"broker_url": "", "username": "", "password": ""},
+    }
+)
+
+# Importing the app connects to the MQTT broker, so replace the client while importing it
+_mqtt_mock = mock.MagicMock()
+for _decorator in (_mqtt_mock.on_connect, _mqtt_mock.on_topic, _mqtt_mock.on_message):
+    _decorator.return_value = lambda f: f
+with mock.patch("flask_mqtt.Mqtt", return_value=_mqtt_mock):
+    from wgkex.broker import app
+
+_VALID_KEY = "gPLTm5SIHlXfN1dzeDMGgXSK7j9JHZuSunG0utewDGw="
+_WORKER_DATA = {
+    "ExternalAddress": "gw.example.net",
+    "Port": 51820,
+    "PublicKey": _VALID_KEY,
+    "LinkAddress": "fe80::1",
+}
+
+
+def tearDownModule() -> None:
+    app.key_publisher.stop()
+    config._parsed_config = None
+
+
+class AppTest(unittest.TestCase):
+    def test_is_valid_wg_pubkey_success(self):
+        """Verify is_valid_wg_pubkey accepts and returns a valid key."""
+        self.assertEqual(app.is_valid_wg_pubkey(_VALID_KEY), _VALID_KEY)
+
+    def test_is_valid_wg_pubkey_fails_bad_key(self):
+        """Verify is_valid_wg_pubkey rejects malformed keys."""
+        for key in (
+            "",
+            _VALID_KEY[:-1],
+            _VALID_KEY + "=",
+            # Final character before the padding doesn't encode a 32 byte key
+            _VALID_KEY[:42] + "x=",
+            # Character outside of the base64 alphabet
+            "-" + _VALID_KEY[1:],
+        ):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                app.is_valid_wg_pubkey(key)
+
+    def test_json_response_from_dict(self):
+        """Verify routes returning a dict respond with the equivalent JSON object."""
+        client = app.app.test_client()
+        resp = client.post(
+            "/api/v1/wg/key/exchange",
+            data='{"domain": "not_configured", "public_key": "%s"}' % _VALID_KEY,
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.mimetype, "application/json")
+        self.assertEqual(
+            json.loads(resp.data),
+            {"error": {"message": "Domain not_configured not in configured domains."}},
+        )
+        _mqtt_mock.publish.assert_not_called()
+
+    def test_worker_data_from_dict_success(self):
+        """Verify WorkerData.from_dict converts a worker data message."""
+        data = app.WorkerData.from_dict(_WORKER_DATA)
+        self.assertEqual(
+            data,
+            app.WorkerData(
+                external_address="gw.example.net",
+                port=51820,
+                public_key=_VALID_KEY,
+                link_address="fe80::1",
+            ),
+        )
+
+    def test_worker_data_from_dict_fails_bad_field(self):
+        """Verify WorkerData.from_dict rejects non-string fields instead of converting them."""
+        for field in ("ExternalAddress", "PublicKey", "LinkAddress"):
+            for value in (None, 1, ["fe80::1"]):
+                with self.subTest(field=field, value=value), self.assertRaises(
+                    ValueError
+                ):
+                    app.WorkerData.from_dict({**_WORKER_DATA, field: value})
+
+    def test_worker_data_from_dict_fails_missing_field(self):
+        """Verify WorkerData.from_dict rejects messages with missing fields."""
+        msg = dict(_WORKER_DATA)
+        del msg["LinkAddress"]
+        with self.assertRaises(KeyError):
+            app.WorkerData.from_dict(msg)
+
+    def test_handle_mqtt_message_data_success(self):
+        """Verify valid worker data is stored for the worker and domain."""
+        message = mock.MagicMock()
+        message.topic = f"wireguard-worker/worker1/{_TEST_DOMAIN}/data"
+        message.payload = json.dumps(_WORKER_DATA).encode()
+        app.handle_mqtt_message_data(None, None, message)
+
+        self.assertEqual(
+            app.worker_data.get(("worker1", _TEST_DOMAIN)),
+            app.WorkerData.from_dict(_WORKER_DATA),
+        )
+
+    def test_handle_mqtt_message_data_invalid(self):
+        """Verify invalid worker data is not stored."""
+        message = mock.MagicMock()
+        message.topic = f"wireguard-worker/worker2/{_TEST_DOMAIN}/data"
+        for payload in (
+            b"not json",
+            b"[]",
+            json.dumps({**_WORKER_DATA, "LinkAddress": None}).encode(),
+        ):
+            with self.subTest(payload=payload):
+                message.payload = payload
+                app.handle_mqtt_message_data(None, None, message)
+                self.assertIsNone(app.worker_data.get(("worker2", _TEST_DOMAIN)))
+
+    def test_handle_mqtt_message_metrics_success(self):
+        """Verify metrics messages update the worker metrics."""
+        message = mock.MagicMock()
+        message.topic = f"wireguard-metrics/{_TEST_DOMAIN}/worker3/connected_peers"
+        message.payload = b"12"
+        app.handle_mqtt_message_metrics(None, None, message)
+
+        self.assertEqual(
+            app.worker_metrics.get("worker3")
+            .get_domain_metrics(_TEST_DOMAIN)
+            .get("connected_peers"),
+            12,
+        )
+
+    def test_handle_mqtt_messages_malformed_topic(self):
+        """Verify messages on malformed topics are ignored without raising."""
+        message = mock.MagicMock()
+        message.payload = b"1"
+        for handler, topic in (
+            (app.handle_mqtt_message_metrics, f"wireguard-metrics/{_TEST_DOMAIN}"),
+            (app.handle_mqtt_message_metrics, f"wireguard-metrics/{_TEST_DOMAIN}//m"),
+            (app.handle_mqtt_message_status, "wireguard-worker"),
+            (app.handle_mqtt_message_data, "wireguard-worker/worker4"),
+        ):
+            with self.subTest(topic=topic):
+                message.topic = topic
+                handler(None, None, message)
+
+
+if __name__ == "__main__":
+    unittest.main()
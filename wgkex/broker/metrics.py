@@ -1,4 +1,5 @@
 import dataclasses
+import threading
 from operator import itemgetter
 from typing import Any, Dict, Optional, Tuple
 
@@ -7,7 +8,7 @@ from wgkex.common import logger
 from wgkex.common.mqtt import CONNECTED_PEERS_METRIC
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class WorkerMetrics:
     """Metrics of a single worker"""
 
@@ -49,54 +50,86 @@ class WorkerMetrics:
 @dataclasses.dataclass
 class WorkerMetricsCollection:
     """A container for all worker metrics
-    # TODO make threadsafe / fix data races
+    Metrics must only be modified through this class to keep the maintained counters correct.
+    Modifications and get_best_worker are serialized by an internal lock.
     """
 
     #     worker -> WorkerMetrics
     data: Dict[str, WorkerMetrics] = dataclasses.field(default_factory=dict)
+    # Number of workers in data that are online, maintained on every transition
+    _online_count: int = dataclasses.field(default=0, repr=False, compare=False)
+    # Sum of connected peers over all workers and domains, maintained on every update
+    _total_peers: int = dataclasses.field(default=0, repr=False, compare=False)
+    _lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False
+    )
 
     def get(self, worker: str) -> WorkerMetrics:
         return self.data.get(worker, WorkerMetrics(worker=worker))
 
     def set(self, worker: str, metrics: WorkerMetrics) -> None:
-        self.data[worker] = metrics
+        with self._lock:
+            old = self.data.get(worker)
+            if old is not None and old.online:
+                self._online_count -= 1
+            if metrics.online:
+                self._online_count += 1
+            if old is not None:
+                self._total_peers -= old.get_peer_count()
+            self._total_peers += metrics.get_peer_count()
+            self.data[worker] = metrics
 
     def update(self, worker: str, domain: str, metric: str, value: Any) -> None:
-        if worker in self.data:
-            self.data[worker].set_metric(domain, metric, value)
-        else:
-            metrics = WorkerMetrics(worker)
-            metrics.set_metric(domain, metric, value)
-            self.data[worker] = metrics
+        with self._lock:
+            if metric == CONNECTED_PEERS_METRIC:
+                old = self.get(worker).get_domain_metrics(domain).get(metric, 0)
+                self._total_peers += max(value, 0) - max(old, 0)
+            if worker in self.data:
+                self.data[worker].set_metric(domain, metric, value)
+            else:
+                metrics = WorkerMetrics(worker)
+                metrics.set_metric(domain, metric, value)
+                self.data[worker] = metrics
+
+    def atomic_increment(
+        self, worker: str, domain: str, metric: str, delta: int = 1
+    ) -> int:
+        """Adds delta to a metric of a worker and domain without racing concurrent updates.
+        A metric that has not been set yet counts as 0.
+
+        Returns:
+            The new value of the metric.
+        """
+        with self._lock:
+            value = self.get(worker).get_domain_metrics(domain).get(metric, 0) + delta
+            self.update(worker, domain, metric, value)
+            return value
 
     def set_online(self, worker: str) -> None:
-        if worker in self.data:
-            self.data[worker].online = True
-        else:
-            metrics = WorkerMetrics(worker)
-            metrics.online = True
-            self.data[worker] = metrics
+        with self._lock:
+            if worker in self.data:
+                if self.data[worker].online:
+                    return
+                self.data[worker].online = True
+            else:
+                metrics = WorkerMetrics(worker)
+                metrics.online = True
+                self.data[worker] = metrics
+            self._online_count += 1
 
     def set_offline(self, worker: str) -> None:
-        if worker in self.data:
-            self.data[worker].online = False
+        with self._lock:
+            if worker in self.data and self.data[worker].online:
+                self.data[worker].online = False
+                self._online_count -= 1
+
+    def get_online_count(self) -> int:
+        """Returns the number of workers currently marked as online"""
+        return self._online_count
 
     def get_total_peer_count(self) -> int:
         """Returns the sum of connected peers over all workers and domains"""
-        total = 0
-        for worker in self.data:
-            worker_data = self.data.get(worker)
-            if not worker_data:
-                continue
-            for domain in worker_data.domain_data:
-                total += max(
-                    worker_data.get_domain_metrics(domain).get(
-                        CONNECTED_PEERS_METRIC, 0
-                    ),
-                    0,
-                )
-
-        return total
+        return self._total_peers
 
     def get_best_worker(self, domain: str) -> Tuple[Optional[str], int, int]:
         """Analyzes the metrics and determines the best worker that a new client should connect to.
@@ -107,24 +140,35 @@ class WorkerMetricsCollection:
             A 3-tuple containing the worker name, difference to target peers, number of connected peers.
             The worker name can be None if none is online.
         """
+        if self.get_online_count() == 0:
+            return None, 0, 0
+
         # Map metrics to a list of (target diff, peer count, worker) tuples for online workers
 
         peers_worker_tuples = []
-        total_peers = self.get_total_peer_count()
-        worker_cfg = config.get_config().workers
-
-        for wm in self.data.values():
-            if not wm.is_online(domain):
-                continue
-
-            peers = wm.get_peer_count()
-            rel_weight = worker_cfg.relative_worker_weight(wm.worker)
-            target = rel_weight * total_peers
-            diff = peers - target
-            logger.debug(
-                f"Worker candidate {wm.worker}: current {peers}, target {target} (total {total_peers}, rel weight {rel_weight}), diff {diff}"
-            )
-            peers_worker_tuples.append((diff, peers, wm.worker))
+        # Hold the lock so concurrent MQTT updates can't change the metrics while iterating
+        with self._lock:
+            total_peers = self.get_total_peer_count()
+            worker_cfg = config.get_config().workers
+
+            for wm in self.data.values():
+                if not wm.is_online(domain):
+                    continue
+
+                peers = wm.get_peer_count()
+                rel_weight = worker_cfg.relative_worker_weight(wm.worker)
+                target = rel_weight * total_peers
+                diff = peers - target
+                logger.debug(
+                    "Worker candidate %s: current %s, target %s (total %s, rel weight %s), diff %s",
+                    wm.worker,
+                    peers,
+                    target,
+                    total_peers,
+                    rel_weight,
+                    diff,
+                )
+                peers_worker_tuples.append((diff, peers, wm.worker))
 
         # Sort by diff (ascending), workers with most peers missing to target are sorted first
         peers_worker_tuples = sorted(peers_worker_tuples, key=itemgetter(0))
@@ -2,7 +2,7 @@ import unittest
 
 import mock
 from wgkex.config import config
-from wgkex.broker.metrics import WorkerMetricsCollection
+from wgkex.broker.metrics import WorkerMetrics, WorkerMetricsCollection
 
 
 class TestMetrics(unittest.TestCase):
@@ -40,6 +40,19 @@ class TestMetrics(unittest.TestCase):
         ret = worker_metrics.get("worker1").is_online()
         self.assertFalse(ret)
 
+    def test_online_count_tracks_transitions(self):
+        """Verify get_online_count follows set_online and set_offline transitions."""
+        worker_metrics = WorkerMetricsCollection()
+        worker_metrics.set_online("worker1")
+        worker_metrics.set_online("worker1")
+        worker_metrics.set_online("worker2")
+        self.assertEqual(worker_metrics.get_online_count(), 2)
+
+        worker_metrics.set_offline("worker1")
+        worker_metrics.set_offline("worker1")
+        worker_metrics.set_offline("worker3")
+        self.assertEqual(worker_metrics.get_online_count(), 1)
+
     def test_unkown_is_offline(self):
         """Verify an unkown worker is considered offline."""
         worker_metrics = WorkerMetricsCollection()
@@ -65,6 +78,40 @@ class TestMetrics(unittest.TestCase):
         ret = worker_metrics.get("worker1").is_online("d")
         self.assertFalse(ret)
 
+    def test_atomic_increment_returns_new_value(self):
+        """Verify atomic_increment adds to the current value and returns the result."""
+        worker_metrics = WorkerMetricsCollection()
+        worker_metrics.update("worker1", "d", "connected_peers", 5)
+
+        ret = worker_metrics.atomic_increment("worker1", "d", "connected_peers")
+        self.assertEqual(ret, 6)
+        self.assertEqual(
+            worker_metrics.get("worker1").get_domain_metrics("d")["connected_peers"], 6
+        )
+
+    def test_atomic_increment_unknown_metric(self):
+        """Verify atomic_increment treats a metric that was not set yet as 0."""
+        worker_metrics = WorkerMetricsCollection()
+
+        ret = worker_metrics.atomic_increment("worker1", "d", "connected_peers", 3)
+        self.assertEqual(ret, 3)
+
+    def test_get_total_peer_count_tracks_updates(self):
+        """Verify get_total_peer_count follows updates, ignoring negative peer counts."""
+        worker_metrics = WorkerMetricsCollection()
+        worker_metrics.update("worker1", "domain1", "connected_peers", 5)
+        worker_metrics.update("worker1", "domain2", "connected_peers", 3)
+        worker_metrics.update("worker2", "domain1", "connected_peers", 7)
+        worker_metrics.update("worker2", "domain1", "other_metric", 100)
+        self.assertEqual(worker_metrics.get_total_peer_count(), 15)
+
+        worker_metrics.update("worker1", "domain1", "connected_peers", -1)
+        worker_metrics.atomic_increment("worker2", "domain1", "connected_peers")
+        self.assertEqual(worker_metrics.get_total_peer_count(), 11)
+
+        worker_metrics.set("worker2", WorkerMetrics(worker="worker2"))
+        self.assertEqual(worker_metrics.get_total_peer_count(), 3)
+
     @mock.patch("wgkex.broker.metrics.config.get_config", autospec=True)
     def test_get_best_worker_returns_best(self, config_mock):
         """Verify get_best_worker returns the worker with least connected clients for equally weighted workers."""
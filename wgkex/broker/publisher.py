@@ -0,0 +1,103 @@
+"""Batched publishing of exchanged keys to MQTT."""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from wgkex.common import logger
+
+# Seconds to wait for further keys after the first key of a batch arrived
+_BATCH_WINDOW = 0.005
+# Queued to make the background thread exit
+_STOP = object()
+
+
+class KeyPublisher:
+    """Collects exchanged keys per topic and publishes them in batches.
+
+    By default every key of a batch is published as a separate message containing the plain key.
+    With publish_lists enabled, batches of more than one key are published as a single JSON list
+    instead. Workers that predate JSON list support treat such a list as one invalid key, so only
+    enable it after all workers have been upgraded.
+
+    Attributes:
+        publish: The function used to publish a payload on a topic, e.g. Mqtt.publish.
+        window: Seconds to wait for further keys after the first key of a batch arrived.
+        publish_lists: Whether to publish batches of multiple keys as a JSON list.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, str | bytes], Any],
+        window: float = _BATCH_WINDOW,
+        publish_lists: bool = False,
+    ) -> None:
+        self.publish = publish
+        self.window = window
+        self.publish_lists = publish_lists
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Starts the background thread publishing the queued keys."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Publishes the keys queued so far and waits for the background thread to exit."""
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def put(self, topic: str, key: str) -> None:
+        """Queues a key for publishing on the given topic."""
+        self._queue.put((topic, key))
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            for topic, keys in batch.items():
+                try:
+                    self._publish_keys(topic, keys)
+                except Exception as e:
+                    # Don't crash the thread when an exception is encountered
+                    logger.error("Exception while publishing keys on %s:", topic)
+                    logger.error(e)
+
+    def _next_batch(self) -> Tuple[Dict[str, List[str]], bool]:
+        """Blocks until a key is queued, then collects further keys until the window has passed.
+
+        Returns:
+            A dict mapping topics to the deduplicated keys to publish on them,
+            and whether stop() was called.
+        """
+        batch: Dict[str, List[str]] = {}
+        item = self._queue.get()
+        deadline = time.monotonic() + self.window
+        while item is not _STOP:
+            topic, key = item
+            keys = batch.setdefault(topic, [])
+            if key not in keys:
+                keys.append(key)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _publish_keys(self, topic: str, keys: List[str]) -> None:
+        logger.debug("Publishing %d key(s) on %s", len(keys), topic)
+        if self.publish_lists and len(keys) > 1:
+            self.publish(topic, orjson.dumps(keys))
+            return
+        for key in keys:
+            self.publish(topic, key)
@@ -0,0 +1,69 @@
+import unittest
+
+import mock
+from wgkex.broker.publisher import KeyPublisher
+
+
+class TestKeyPublisher(unittest.TestCase):
+    def test_single_key_published_plain(self):
+        """Verify a single key is published as the plain key."""
+        publish_mock = mock.MagicMock()
+        publisher = KeyPublisher(publish_mock, window=0.01, publish_lists=True)
+        publisher.start()
+        publisher.put("wireguard/domain1/all", "PUB_KEY")
+        publisher.stop()
+
+        publish_mock.assert_called_once_with("wireguard/domain1/all", "PUB_KEY")
+
+    def test_keys_published_separately_by_default(self):
+        """Verify keys of a batch are published as separate plain keys unless lists are enabled."""
+        publish_mock = mock.MagicMock()
+        publisher = KeyPublisher(publish_mock, window=0.5)
+        publisher.put("wireguard/domain1/all", "PUB_KEY1")
+        publisher.put("wireguard/domain1/all", "PUB_KEY2")
+        publisher.put("wireguard/domain1/all", "PUB_KEY1")
+        publisher.start()
+        publisher.stop()
+
+        self.assertEqual(
+            publish_mock.mock_calls,
+            [
+                mock.call("wireguard/domain1/all", "PUB_KEY1"),
+                mock.call("wireguard/domain1/all", "PUB_KEY2"),
+            ],
+        )
+
+    def test_keys_batched_per_topic(self):
+        """Verify keys queued within the window are published as one JSON list per topic."""
+        publish_mock = mock.MagicMock()
+        publisher = KeyPublisher(publish_mock, window=0.5, publish_lists=True)
+        publisher.put("wireguard/domain1/all", "PUB_KEY1")
+        publisher.put("wireguard/domain1/all", "PUB_KEY2")
+        publisher.put("wireguard/domain1/all", "PUB_KEY1")
+        publisher.put("wireguard/domain2/all", "PUB_KEY3")
+        publisher.start()
+        publisher.stop()
+
+        self.assertEqual(
+            publish_mock.mock_calls,
+            [
+                mock.call("wireguard/domain1/all", b'["PUB_KEY1","PUB_KEY2"]'),
+                mock.call("wireguard/domain2/all", "PUB_KEY3"),
+            ],
+        )
+
+    def test_publish_exception_does_not_stop_thread(self):
+        """Verify an exception while publishing doesn't stop the publisher."""
+        publish_mock = mock.MagicMock(side_effect=[Exception("Mocked exception"), None])
+        publisher = KeyPublisher(publish_mock, window=0)
+        publisher.put("wireguard/domain1/all", "PUB_KEY1")
+        publisher.put("wireguard/domain1/all", "PUB_KEY2")
+        publisher.start()
+        publisher.stop()
+
+        self.assertEqual(publish_mock.call_count, 2)
+        publish_mock.assert_called_with("wireguard/domain1/all", "PUB_KEY2")
+
+
+if __name__ == "__main__":
+    unittest.main()
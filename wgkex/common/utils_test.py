@@ -1,4 +1,6 @@
 import unittest
+
+import mock
 from wgkex.common import utils
 
 
@@ -23,6 +25,15 @@ class UtilsTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             utils.mac2eui64("c4:91:0c:b2:c5:a0", "not_ipv6_addr")
 
+    @mock.patch.object(utils.config, "get_config")
+    def test_is_valid_domain(self, config_mock):
+        """Verify is_valid_domain accepts configured domains with a configured prefix only."""
+        config_mock.return_value.domains = ["ffmuc_domain1", "domain2"]
+        config_mock.return_value.domain_prefixes = ["ffmuc_"]
+        self.assertTrue(utils.is_valid_domain("ffmuc_domain1"))
+        self.assertFalse(utils.is_valid_domain("domain2"))
+        self.assertFalse(utils.is_valid_domain("ffmuc_domain3"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -77,16 +77,23 @@ class BrokerListen:
     Attributes:
         host: The listen address the broker should listen to for the HTTP API.
         port: The port the broker should listen to for the HTTP API.
+        threads: The number of threads handling HTTP API requests, defaults to 4.
     """
 
     host: Optional[str]
     port: Optional[int]
+    threads: int = 4
 
     @classmethod
     def from_dict(cls, broker_listen: Dict[str, Any]) -> "BrokerListen":
+        threads = broker_listen.get("threads")
+        threads = cls.threads if threads is None else int(threads)
+        if threads < 1:
+            raise ValueError(f"broker_listen.threads must be at least 1, got {threads}")
         return cls(
             host=broker_listen.get("host"),
             port=broker_listen.get("port"),
+            threads=threads,
         )
 
 
@@ -140,6 +147,7 @@ class Config:
         mqtt: The MQTT configuration.
         workers: The worker weights configuration (broker-only).
         externalName: The publicly resolvable domain name or public IP address of this worker (worker-only).
+        publish_key_lists: Whether to publish batches of exchanged keys as JSON list (broker-only).
     """
 
     raw: Dict[str, Any]
@@ -149,6 +157,7 @@ class Config:
     mqtt: MQTT
     workers: Workers
     external_name: Optional[str]
+    publish_key_lists: bool = False
 
     @classmethod
     def from_dict(cls, cfg: Dict[str, Any]) -> "Config":
@@ -169,6 +178,7 @@ class Config:
             mqtt=mqtt_cfg,
             workers=workers_cfg,
             external_name=cfg.get("externalName"),
+            publish_key_lists=bool(cfg.get("publish_key_lists", False)),
         )
 
     def get(self, key: str) -> Any:
@@ -197,7 +207,7 @@ def get_config() -> Config:
             sys.exit(1)
         try:
             config = Config.from_dict(config)
-        except (KeyError, TypeError, AttributeError) as e:
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
             print("Failed to lint file: %s" % e)
             sys.exit(2)
         _parsed_config = config
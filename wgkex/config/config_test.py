@@ -44,6 +44,51 @@ class TestConfig(unittest.TestCase):
             config.get_config()
             exit_mock.assert_called_with(2)
 
+    def test_load_config_broker_listen_defaults(self):
+        """Test broker_listen falls back to default values if unspecified."""
+        mock_open = mock.mock_open(read_data=_VALID_CFG)
+        with mock.patch("builtins.open", mock_open):
+            broker_listen = config.get_config().broker_listen
+            self.assertIsNone(broker_listen.host)
+            self.assertIsNone(broker_listen.port)
+            self.assertEqual(broker_listen.threads, 4)
+
+    def test_load_config_broker_listen_threads(self):
+        """Test broker_listen threads is read from config."""
+        cfg = _VALID_CFG + "broker_listen:\n  host: 0.0.0.0\n  threads: 16\n"
+        mock_open = mock.mock_open(read_data=cfg)
+        with mock.patch("builtins.open", mock_open):
+            broker_listen = config.get_config().broker_listen
+            self.assertEqual(broker_listen.host, "0.0.0.0")
+            self.assertEqual(broker_listen.threads, 16)
+
+    def test_load_config_broker_listen_threads_null(self):
+        """Test broker_listen threads falls back to the default if set to null."""
+        cfg = _VALID_CFG + "broker_listen:\n  threads:\n"
+        mock_open = mock.mock_open(read_data=cfg)
+        with mock.patch("builtins.open", mock_open):
+            self.assertEqual(config.get_config().broker_listen.threads, 4)
+
+    @mock.patch.object(config.sys, "exit", autospec=True)
+    def test_load_config_fails_broker_listen_threads_zero(self, exit_mock):
+        """Test broker_listen threads below 1 fails lint."""
+        cfg = _VALID_CFG + "broker_listen:\n  threads: 0\n"
+        mock_open = mock.mock_open(read_data=cfg)
+        with mock.patch("builtins.open", mock_open):
+            config.get_config()
+            exit_mock.assert_called_with(2)
+
+    def test_load_config_publish_key_lists(self):
+        """Test publish_key_lists defaults to off and is read from config."""
+        mock_open = mock.mock_open(read_data=_VALID_CFG)
+        with mock.patch("builtins.open", mock_open):
+            self.assertFalse(config.get_config().publish_key_lists)
+        config._parsed_config = None
+
+        mock_open = mock.mock_open(read_data=_VALID_CFG + "publish_key_lists: true\n")
+        with mock.patch("builtins.open", mock_open):
+            self.assertTrue(config.get_config().publish_key_lists)
+
     def test_fetch_config_from_disk_success(self):
         """Test fetch file from disk."""
         mock_open = mock.mock_open(read_data=_VALID_CFG)
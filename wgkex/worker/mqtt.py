@@ -38,7 +38,7 @@ def connect(exit_event: threading.Event) -> None:
     broker_address = base_config.broker_url
     broker_port = base_config.broker_port
     broker_keepalive = base_config.keepalive
-    client = mqtt.Client(_HOSTNAME)
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=_HOSTNAME)
     domains = get_config().domains
 
     # Register LWT to set worker status down when lossing connection
@@ -79,36 +79,48 @@ def connect(exit_event: threading.Event) -> None:
     client.loop_forever()
 
 
-def on_disconnect(client: mqtt.Client, userdata: Any, rc):
+def on_disconnect(
+    client: mqtt.Client,
+    userdata: Any,
+    flags: mqtt.DisconnectFlags,
+    rc: mqtt.ReasonCode,
+    properties: Optional[mqtt.Properties],
+):
     """Handles MQTT disconnect and logs the event
 
-    Expected signature for MQTT v3.1.1 and v3.1 is:
-        disconnect_callback(client, userdata, rc)
-
-    and for MQTT v5.0:
-        disconnect_callback(client, userdata, reasonCode, properties)
+    Expected signature for callback API version 2 is:
+        disconnect_callback(client, userdata, disconnect_flags, reason_code, properties)
 
     Arguments:
         client:     the client instance for this callback
         userdata:   the private user data as set in Client() or userdata_set()
-        rc:         the disconnection result
+        flags:      the disconnect flags.
+        rc:         the disconnection reason code
                     The rc parameter indicates the disconnection state. If
-                    MQTT_ERR_SUCCESS (0), the callback was called in response to
+                    it is a success (0), the callback was called in response to
                     a disconnect() call. If any other value the disconnection
                     was unexpected, such as might be caused by a network error.
+        properties: the MQTT v5.0 properties received from the broker, None for older protocol versions.
     """
     logger.debug("Disconnected with result code " + str(rc))
 
 
 # The callback for when the client receives a CONNACK response from the server.
-def on_connect(client: mqtt.Client, userdata: Any, flags, rc) -> None:
+def on_connect(
+    client: mqtt.Client,
+    userdata: Any,
+    flags: mqtt.ConnectFlags,
+    rc: mqtt.ReasonCode,
+    properties: Optional[mqtt.Properties],
+) -> None:
     """Handles MQTT connect and subscribes to topics on connect
 
     Arguments:
         client: the client instance for this callback.
         userdata: the private user data.
         flags: The MQTT flags.
-        rc: The MQTT rc.
+        rc: The MQTT reason code.
+        properties: The MQTT v5.0 properties, None for older protocol versions.
     """
     logger.debug("Connected with result code " + str(rc))
     domains = get_config().domains
@@ -190,10 +202,27 @@ def on_message_wireguard(
     # this will not work, if we have non-unique prefix stripped domains
     domain = domain.group(1)
     logger.debug("Found domain %s", domain)
-    logger.info(
-        f"Received create message for key {str(message.payload.decode('utf-8'))} on domain {domain} adding to queue"
-    )
-    q.put((domain, str(message.payload.decode("utf-8"))))
+
+    # The broker publishes batches of keys as JSON list, single keys as plain string
+    if message.payload.startswith(b"["):
+        try:
+            keys = json.loads(message.payload)
+        except ValueError:
+            keys = None
+        if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+            logger.error(
+                "Invalid key list received on %s: %r", message.topic, message.payload
+            )
+            return
+    else:
+        keys = [message.payload.decode("utf-8")]
+    for key in keys:
+        logger.info(
+            "Received create message for key %s on domain %s adding to queue",
+            key,
+            domain,
+        )
+        q.put((domain, key))
 
 
 def publish_metrics_loop(
@@ -74,7 +74,7 @@ class MQTTTest(unittest.TestCase):
 
         hostname = socket.gethostname()
 
-        mqtt.on_connect(mqtt.mqtt.Client(), None, None, 0)
+        mqtt.on_connect(mqtt.mqtt.Client(), None, None, 0, None)
 
         mqtt_client_mock.assert_has_calls(
             [
@@ -196,6 +196,29 @@ class MQTTTest(unittest.TestCase):
         item = mqtt.q.get_nowait()
         self.assertEqual(item, ("domain1", "PUB_KEY"))
 
+    @mock.patch.object(mqtt, "get_config")
+    def test_on_message_wireguard_batch_success(self, config_mock):
+        # Tests on_message for success with a batch of keys.
+        config_mock.return_value = _get_config_mock()
+        mqtt_msg = mock.patch.object(mqtt.mqtt, "MQTTMessage")
+        mqtt_msg.topic = "wireguard/_ffmuc_domain1/gateway"
+        mqtt_msg.payload = b'["PUB_KEY1", "PUB_KEY2"]'
+        mqtt.on_message_wireguard(None, None, mqtt_msg)
+        items = {mqtt.q.get_nowait(), mqtt.q.get_nowait()}
+        self.assertEqual(items, {("domain1", "PUB_KEY1"), ("domain1", "PUB_KEY2")})
+
+    @mock.patch.object(mqtt, "get_config")
+    def test_on_message_wireguard_batch_invalid(self, config_mock):
+        # Tests on_message drops invalid batches of keys.
+        config_mock.return_value = _get_config_mock()
+        mqtt_msg = mock.patch.object(mqtt.mqtt, "MQTTMessage")
+        mqtt_msg.topic = "wireguard/_ffmuc_domain1/gateway"
+        for payload in (b'["PUB_KEY1"', b'["PUB_KEY1", 2]', b"[[]]"):
+            with self.subTest(payload=payload):
+                mqtt_msg.payload = payload
+                mqtt.on_message_wireguard(None, None, mqtt_msg)
+                self.assertTrue(mqtt.q.empty())
+
 
 """ @mock.patch.object(msg_queue, "link_handler")
     @mock.patch.object(mqtt, "get_config")